@@ -1,11 +1,31 @@
 import json
 import os
+import subprocess
 import sys
 import traceback
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from selectolax.lexbor import LexborHTMLParser
 from datetime import datetime
 
+BASE_URL = 'https://oga.site.nthu.edu.tw'
+ABS_PREFIXES = ('http://', 'https://')
+
+# Returned by scrape_nthu_oga when the server answers 304 Not Modified
+NO_CHANGE = object()
+
+# Post containers on the OGA listing page; matched in one pass by Lexbor's C selector engine
+MTITLE_SELECTOR = 'div.mtitle'
+
+# Shared session so connections (and TLS handshakes) are reused across requests
+SESSION = requests.Session()
+SESSION.mount('https://', HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=4,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[502, 503, 504])
+))
+
 def send_notification(changes):
     """
     Send a single consolidated notification for all changes
@@ -27,8 +47,12 @@ def send_notification(changes):
     # Print the notification content directly (will be captured for email)
     print(''.join(body))
 
-def scrape_nthu_oga():
-    """Scrape NTHU OGA website for posts"""
+def scrape_nthu_oga(etag=None, last_modified=None):
+    """
+    Scrape NTHU OGA website for posts
+    etag, last_modified: validators saved by the last run, used for a conditional GET
+    Returns (items, etag, last_modified), or NO_CHANGE if the page is unchanged
+    """
     print("Starting scraping NTHU OGA website...")
     
     URL = 'https://oga.site.nthu.edu.tw/p/403-1524-8945-1.php?Lang=en'
@@ -41,105 +65,91 @@ def scrape_nthu_oga():
             'Accept-Language': 'en-US,en;q=0.9',
         }
         
+        # Let the server answer 304 Not Modified if the page is unchanged
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        
         print(f"Sending request to {URL}")
-        resp = requests.get(URL, headers=headers, timeout=30)
+        resp = SESSION.get(URL, headers=headers, timeout=30)
         print(f"Received response with status code: {resp.status_code}")
         
-        soup = BeautifulSoup(resp.text, 'html.parser')
+        if resp.status_code == 304:
+            return NO_CHANGE
+        
+        # Hand Lexbor the raw UTF-8 bytes; resp.text would decode (and possibly
+        # sniff the charset of) the whole body into a str first
+        tree = LexborHTMLParser(resp.content)
         
         # Look for mtitle class divs
-        mtitle_divs = soup.find_all('div', class_='mtitle')
+        mtitle_divs = tree.css(MTITLE_SELECTOR)
         print(f"Found {len(mtitle_divs)} div elements with class 'mtitle'")
         
         current_data = []
         for div in mtitle_divs:
-            if div.a:
-                title = div.a.text.strip()
-                url = div.a.get('href', '')
-                
-                # Fix relative URLs
-                if url and not url.startswith(('http://', 'https://')):
-                    base_url = 'https://oga.site.nthu.edu.tw'
-                    url = base_url + url if url.startswith('/') else base_url + '/' + url
-                
-                current_item = {
-                    'title': title,
-                    'url': url,
-                    'scrape_date': datetime.now().strftime("%Y-%m-%d")
-                }
-                current_data.append(current_item)
-        
-        # If no items found with mtitle class, try a more generic approach
-        if not current_data:
-            print("No items found with mtitle class, trying alternative approach")
-            # Try to find news items in other containers
-            for div in soup.find_all('div'):
-                links = div.find_all('a')
-                if links and len(links) > 0:
-                    for a in links:
-                        text = a.text.strip()
-                        href = a.get('href', '')
-                        
-                        # Only include links that seem like content items (not navigation)
-                        if text and href and len(text) > 10:
-                            # Fix relative URLs
-                            if href and not href.startswith(('http://', 'https://')):
-                                base_url = 'https://oga.site.nthu.edu.tw'
-                                href = base_url + href if href.startswith('/') else base_url + '/' + href
-                            
-                            current_data.append({
-                                'title': text,
-                                'url': href,
-                                'scrape_date': datetime.now().strftime("%Y-%m-%d")
-                            })
+            # Only the first link in each div is the post itself
+            a = div.css_first('a')
+            if a is None:
+                continue
+            
+            title = a.text().strip()
+            url = a.attributes.get('href') or ''
+            
+            # Fix relative URLs
+            if url and not url.startswith(ABS_PREFIXES):
+                url = BASE_URL + (url if url.startswith('/') else '/' + url)
             
-            # Limit to likely content items to avoid navigation links
-            current_data = current_data[:10]  # Take only first 10 items
+            current_item = {
+                'title': title,
+                'url': url
+            }
+            current_data.append(current_item)
         
         print(f"Successfully scraped {len(current_data)} items")
-        return current_data
+        return current_data, resp.headers.get('ETag'), resp.headers.get('Last-Modified')
         
     except Exception as e:
         print(f"Error scraping website: {str(e)}")
         traceback.print_exc()
-        return []
+        return [], None, None
 
 def compare_data(current_data, previous_data):
     """Compare current and previous data and return list of changes"""
     if not previous_data:
         return current_data  # All items are new if no previous data
 
-    updates = []
-    for current_item in current_data:
-        is_new = True
-        for prev_item in previous_data:
-            if current_item['title'] == prev_item['title'] and current_item['url'] == prev_item['url']:
-                is_new = False
-                break
-        if is_new:
-            updates.append(current_item)
-    return updates
+    seen = {(prev_item['title'], prev_item['url']) for prev_item in previous_data}
+    return [item for item in current_data if (item['title'], item['url']) not in seen]
 
 def ensure_data_directory():
     """Ensure the data directory exists"""
     data_dir = 'data'
-    if not os.path.exists(data_dir):
-        try:
-            os.makedirs(data_dir)
-            print(f"Created directory: {data_dir}")
-        except Exception as e:
-            print(f"Error creating directory: {str(e)}")
-            raise
+    try:
+        os.makedirs(data_dir, exist_ok=True)
+    except Exception as e:
+        print(f"Error creating directory: {str(e)}")
+        raise
 
-def save_json_safely(data, filename):
-    """Safely save JSON data to file with error handling"""
+def save_json_safely(data, filename, etag=None, last_modified=None):
+    """
+    Safely save JSON data to file with error handling
+    etag, last_modified: response validators replayed on the next run
+    """
+    data = {
+        'etag': etag,
+        'last_modified': last_modified,
+        'items': data
+    }
     try:
         # First write to a temporary file
         temp_filename = filename + '.tmp'
         with open(temp_filename, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+            json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
         
         # Then rename it to the target file (atomic operation)
+        # No fsync on purpose: the file is committed and pushed right after, so
+        # durability comes from the git remote and fsync would only slow this down
         os.replace(temp_filename, filename)
         print(f"Successfully saved: {filename}")
     except Exception as e:
@@ -147,56 +157,80 @@ def save_json_safely(data, filename):
         # Try one more time with force write
         try:
             with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
+                json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
             print(f"Successfully saved with force write: {filename}")
         except Exception as e:
             print(f"Critical error saving file {filename}: {str(e)}")
             raise
 
+def commit_data_file(filename, message):
+    """Commit the data file and push it (no shell, no global git config)"""
+    # Stage explicitly so the first run can commit a not-yet-tracked data file
+    subprocess.run(['git', 'add', filename], check=False)
+    subprocess.run([
+        'git', '-c', 'user.name=GitHub Action', '-c', 'user.email=action@github.com',
+        'commit', '-m', message, '--', filename
+    ], check=False)
+    subprocess.run(['git', 'push'], check=False)
+
 def main():
     print("Starting main function...")
     try:
-        ensure_data_directory()
-        
         filename = 'data/nthu_oga_posts.json'
-        print(f"Working directory: {os.getcwd()}")
         
-        current_data = scrape_nthu_oga()
+        previous_data = None
+        legacy_format = False
+        try:
+            with open(filename, 'r', encoding='utf-8') as f:
+                previous_data = json.load(f)
+            # Older files hold a bare list of items without validators
+            if isinstance(previous_data, list):
+                legacy_format = True
+                previous_data = {'etag': None, 'last_modified': None, 'items': previous_data}
+            print(f"Loaded previous data from {filename}")
+        except FileNotFoundError:
+            print(f"No existing file found at {filename}")
+        except Exception as e:
+            print(f"Error reading previous data from {filename}: {str(e)}")
+        
+        if previous_data:
+            result = scrape_nthu_oga(previous_data.get('etag'), previous_data.get('last_modified'))
+        else:
+            result = scrape_nthu_oga()
+        if result is NO_CHANGE:
+            print("304 - page not modified since last run, skipping")
+            return
+        
+        current_data, etag, last_modified = result
         if not current_data:
             print("No data scraped, exiting")
             return
-            
-        previous_data = None
-        if os.path.exists(filename):
-            print(f"Found existing file: {filename}")
-            try:
-                with open(filename, 'r', encoding='utf-8') as f:
-                    previous_data = json.load(f)
-                print(f"Loaded previous data from {filename}")
-            except Exception as e:
-                print(f"Error reading previous data from {filename}: {str(e)}")
-        else:
-            print(f"No existing file found at {filename}")
         
-        updates = compare_data(current_data, previous_data)
+        previous_items = previous_data['items'] if previous_data else None
+        
+        updates = compare_data(current_data, previous_items)
         if updates:
             print(f"Found {len(updates)} updates")
             send_notification(updates)
             
             # Always save current data
-            save_json_safely(current_data, filename)
+            ensure_data_directory()
+            save_json_safely(current_data, filename, etag, last_modified)
             
             # After sending notification, commit changes
-            os.system('git config --global user.name "GitHub Action"')
-            os.system('git config --global user.email "action@github.com"')
-            os.system('git add data/*.json')
-            os.system('git commit -m "Update NTHU OGA posts data"')
-            os.system('git push')
+            commit_data_file(filename, 'Update NTHU OGA posts data')
             print("Changes committed and pushed")
+        elif (legacy_format
+              or etag != previous_data.get('etag')
+              or last_modified != previous_data.get('last_modified')):
+            # No new posts, but keep the validators current so the next run can get a 304
+            print("No updates found, saving new page validators")
+            ensure_data_directory()
+            save_json_safely(current_data, filename, etag, last_modified)
+            commit_data_file(filename, 'Update NTHU OGA page validators')
         else:
+            # Nothing changed, so leave the data file (and git) untouched
             print("No updates found")
-            # Still save the current data to update the scrape date
-            save_json_safely(current_data, filename)
                 
     except Exception as e:
         print(f"Error in main function: {str(e)}")